@@ -1,10 +1,14 @@
 import os
-from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException, Query
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from datetime import datetime, timezone
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, Response
 from pydantic import BaseModel
 import asyncpg
+from cachetools import TTLCache
 from typing import Optional, Dict, Any, List
 
 # Environment variables
@@ -24,18 +28,224 @@ else:
     DATABASE_URL = ""
     print("⚠️ Database credentials not found in environment")
 
+# Connection pool sizing - keep warm connections so requests never wait on connect
+PG_POOL_MIN = int(os.getenv("PG_POOL_MIN", "10"))
+PG_POOL_MAX = int(os.getenv("PG_POOL_MAX", "50"))
+
+# Allowed CORS origins (comma-separated), e.g. "https://app.example.com,https://bot.example.com"
+CORS_ORIGINS = [o.strip() for o in os.getenv("CORS_ORIGINS", "*").split(",") if o.strip()]
+
+# Day-rate workers by Telegram username (comma-separated override via DAY_RATE_USERS)
+DAY_RATE_USERS = frozenset(
+    u.strip()
+    for u in os.getenv("DAY_RATE_USERS", "dalwayne,marius,mohamed,said.tiss,hamza").split(",")
+    if u.strip()
+)
+
+# The event loop is chosen by uvicorn's --loop option (uvloop in render.yaml).
+# The io_uring based uringcore loop can be used with --loop app:uringcore_loop
+def uringcore_loop() -> asyncio.AbstractEventLoop:
+    """Create a uringcore event loop (requires the optional uringcore package)"""
+    import uringcore
+    return uringcore.EventLoopPolicy().new_event_loop()
+
+# ============ SQL QUERIES ============
+# Kept as module constants so every call passes the identical string and hits
+# asyncpg's per-connection prepared statement cache
+#
+# Contractor lookups take the approved application with the highest id, the
+# same one migrations/001_contractor_id.sql links work_sessions and jobs to
+
+SQL_GET_WORKER = """
+    SELECT id, trim(concat_ws(' ', first_name, last_name)) AS full_name, email, username
+    FROM contractor_applications
+    WHERE telegram_id = $1 AND status = 'approved'
+    ORDER BY id DESC
+    LIMIT 1
+"""
+
+# LEFT JOIN keeps the contractor row when there are no sessions in the period
+_SQL_HOURS = """
+    SELECT ca.id, ca.full_name, ca.admin_pay_rate,
+           ws.id AS session_id, ws.total_hours, ws.job_site_location,
+           to_char(ws.start_time, 'YYYY-MM-DD') AS session_date,
+           to_char(ws.start_time, 'HH24:MI') AS session_start,
+           COALESCE(to_char(ws.end_time, 'HH24:MI'), 'Active') AS session_end,
+           COALESCE(SUM(NULLIF(ws.total_hours, '')::interval) OVER (), INTERVAL '0') AS period_hours
+    FROM (
+        SELECT id, trim(concat_ws(' ', first_name, last_name)) AS full_name, admin_pay_rate
+        FROM contractor_applications
+        WHERE telegram_id = $1 AND status = 'approved'
+        ORDER BY id DESC
+        LIMIT 1
+    ) ca
+    LEFT JOIN work_sessions ws
+        ON ws.contractor_id = ca.id
+        {session_filter}
+    ORDER BY ws.start_time DESC
+"""
+
+SQL_HOURS_TODAY = _SQL_HOURS.format(session_filter="AND DATE(ws.start_time) = CURRENT_DATE")
+SQL_HOURS_WEEK = _SQL_HOURS.format(session_filter="AND ws.start_time >= CURRENT_DATE - INTERVAL '7 days'")
+
+SQL_PAYMENT_STATUS = """
+    SELECT ca.id, trim(concat_ws(' ', ca.first_name, ca.last_name)) AS full_name,
+           ca.admin_pay_rate, ca.is_cis,
+           (
+               SELECT COALESCE(SUM(NULLIF(ws.total_hours, '')::interval), INTERVAL '0')
+               FROM work_sessions ws
+               WHERE ws.contractor_id = ca.id
+               AND ws.start_time >= CURRENT_DATE - INTERVAL '7 days'
+           ) AS week_hours
+    FROM contractor_applications ca
+    WHERE ca.telegram_id = $1 AND ca.status = 'approved'
+    ORDER BY ca.id DESC
+    LIMIT 1
+"""
+
+# One query serves all sub-contractor endpoints; LEFT JOIN keeps the
+# contractor row when they have no jobs
+SQL_SUBCONTRACTOR_JOBS = """
+    SELECT ca.full_name, j.id, j.title, j.location, j.description, j.status,
+           j.due_date, j.phases
+    FROM (
+        SELECT id, trim(concat_ws(' ', first_name, last_name)) AS full_name
+        FROM contractor_applications
+        WHERE telegram_id = $1 AND status = 'approved'
+        ORDER BY id DESC
+        LIMIT 1
+    ) ca
+    LEFT JOIN jobs j ON j.contractor_id = ca.id
+    ORDER BY j.id DESC
+"""
+
+SQL_CONVERSATION_HISTORY = """
+    SELECT role, message
+    FROM (
+        SELECT id, role, message
+        FROM conversation_history
+        WHERE telegram_id = $1
+        ORDER BY id DESC
+        LIMIT $2
+    ) latest
+    ORDER BY id ASC
+"""
+
+SQL_SAVE_CONVERSATION_MESSAGE = """
+    INSERT INTO conversation_history (telegram_id, role, message)
+    VALUES ($1, $2, $3)
+"""
+
+# Rows buffered per round-trip when streaming result sets with a cursor
+CURSOR_PREFETCH = 64
+
+# Prepared on every new pool connection
+PREPARED_QUERIES = (
+    SQL_GET_WORKER,
+    SQL_HOURS_TODAY,
+    SQL_HOURS_WEEK,
+    SQL_PAYMENT_STATUS,
+    SQL_SUBCONTRACTOR_JOBS,
+    SQL_CONVERSATION_HISTORY,
+    SQL_SAVE_CONVERSATION_MESSAGE,
+)
+
+async def init_connection(conn: asyncpg.Connection):
+    """Warm the statement cache of a new pool connection"""
+    for query in PREPARED_QUERIES:
+        try:
+            # executemany with no argument sets parses and caches the
+            # statement without executing it
+            await conn.executemany(query, [])
+        except asyncpg.PostgresError as e:
+            print(f"⚠️ Failed to prepare statement: {e}")
+
 # Database connection pool
 db_pool: Optional[asyncpg.Pool] = None
 
+# Conversation messages are queued and written in batches by a background task
+CONVERSATION_BATCH_SIZE = 100
+CONVERSATION_FLUSH_INTERVAL = 0.05  # seconds
+conversation_queue: asyncio.Queue = asyncio.Queue()
+conversation_writer_task: Optional[asyncio.Task] = None
+
+async def save_conversation_messages(rows: List[tuple]):
+    """Insert conversation messages in one batch, falling back to one by one.
+    
+    executemany succeeds or fails as a whole, so a single bad row would
+    drop the entire batch; on failure each row is retried on its own and
+    only the rows that fail again are dropped.
+    """
+    try:
+        async with db_pool.acquire() as conn:
+            await conn.executemany(SQL_SAVE_CONVERSATION_MESSAGE, rows)
+        return
+    except Exception as e:
+        print(f"⚠️ Batch insert of {len(rows)} conversation messages failed, retrying individually: {e}")
+    
+    for row in rows:
+        try:
+            async with db_pool.acquire() as conn:
+                await conn.execute(SQL_SAVE_CONVERSATION_MESSAGE, *row)
+        except Exception as e:
+            print(f"❌ Failed to save conversation message for telegram_id {row[0]}: {e}")
+
+async def conversation_writer():
+    """Drain queued conversation messages into the database in batches.
+    
+    A None entry in the queue stops the writer after everything queued
+    before it has been written.
+    """
+    while True:
+        batch = [await conversation_queue.get()]
+        while len(batch) < CONVERSATION_BATCH_SIZE and not conversation_queue.empty():
+            batch.append(conversation_queue.get_nowait())
+        
+        rows = [m for m in batch if m is not None]
+        if rows:
+            await save_conversation_messages(rows)
+        
+        if None in batch:
+            return
+        await asyncio.sleep(CONVERSATION_FLUSH_INTERVAL)
+
+# Database health is checked in the background so /health never touches the pool
+DB_HEALTH_CHECK_INTERVAL = 10  # seconds
+db_health: Dict[str, Any] = {"status": "not configured", "checked_at": None}
+db_health_task: Optional[asyncio.Task] = None
+
+async def db_health_monitor():
+    """Ping the database periodically and record the result in db_health"""
+    while True:
+        try:
+            async with db_pool.acquire() as conn:
+                await conn.fetchval("SELECT 1")
+            db_health["status"] = "connected"
+        except Exception as e:
+            db_health["status"] = f"error: {str(e)}"
+        db_health["checked_at"] = datetime.now(timezone.utc).isoformat()
+        await asyncio.sleep(DB_HEALTH_CHECK_INTERVAL)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application lifespan - startup and shutdown"""
-    global db_pool
+    global db_pool, conversation_writer_task, db_health_task
     # Startup
     if DATABASE_URL:
         try:
-            db_pool = await asyncpg.create_pool(DATABASE_URL, min_size=1, max_size=10)
+            db_pool = await asyncpg.create_pool(
+                DATABASE_URL,
+                min_size=PG_POOL_MIN,
+                max_size=max(PG_POOL_MIN, PG_POOL_MAX),
+                max_inactive_connection_lifetime=300,
+                statement_cache_size=1024,
+                max_cached_statement_lifetime=0,
+                command_timeout=10,
+                init=init_connection
+            )
             print("✅ Database connection pool created")
+            conversation_writer_task = asyncio.create_task(conversation_writer())
+            db_health_task = asyncio.create_task(db_health_monitor())
         except Exception as e:
             print(f"❌ Failed to create database pool: {e}")
     else:
@@ -44,22 +254,54 @@ async def lifespan(app: FastAPI):
     yield
     
     # Shutdown
+    if db_health_task:
+        db_health_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await db_health_task
+    
+    if conversation_writer_task:
+        # Flush queued conversation messages before closing the pool
+        conversation_queue.put_nowait(None)
+        await conversation_writer_task
+        print("✅ Conversation messages flushed")
+    
     if db_pool:
         await db_pool.close()
         print("✅ Database connection pool closed")
 
 # FastAPI app with lifespan
-app = FastAPI(title="Telegram Workforce Bot API", lifespan=lifespan)
+app = FastAPI(
+    title="Telegram Workforce Bot API",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
+)
 
-# CORS middleware
+# CORS middleware - the API is called server-to-server (n8n), so no credentials
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
+    allow_origins=CORS_ORIGINS,
+    allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+# Compress larger JSON responses (hours lists, milestone phases)
+app.add_middleware(GZipMiddleware, minimum_size=500)
+
+# Worker type lookups by chat_id - the mapping rarely changes, so cache approved users
+_worker_type_cache: TTLCache = TTLCache(maxsize=10000, ttl=300)
+
+# Sub-contractor jobs by chat_id - the bot calls the quotes, milestones and
+# payment-status endpoints back-to-back, so share one fetch for a few seconds
+_subcontractor_jobs_cache: TTLCache = TTLCache(maxsize=1000, ttl=5)
+
+@app.exception_handler(asyncpg.PostgresError)
+@app.exception_handler(asyncpg.InterfaceError)
+@app.exception_handler(OSError)  # connect failures and command_timeout (TimeoutError)
+async def database_error_handler(request: Request, exc: Exception):
+    """Turn database errors raised by any endpoint into a 500 response"""
+    return ORJSONResponse(status_code=500, content={"detail": f"Database error: {str(exc)}"})
+
 async def get_db():
     """Get database connection from pool"""
     if not db_pool:
@@ -78,409 +320,293 @@ class ConversationMessage(BaseModel):
 @app.get("/api/telegram/worker-type/{chat_id}")
 async def get_worker_type(chat_id: str):
     """Get worker type for a Telegram user"""
-    try:
-        pool = await get_db()
-        async with pool.acquire() as conn:
-            # Query contractor_applications table
-            user = await conn.fetchrow(
-                """
-                SELECT id, first_name, last_name, email, username, 
-                       CASE 
-                           WHEN username IN ('dalwayne', 'marius', 'mohamed', 'said.tiss', 'hamza') THEN 'day-rate'
-                           ELSE 'sub-contractor'
-                       END as worker_type
-                FROM contractor_applications 
-                WHERE telegram_id = $1 AND status = 'approved'
-                LIMIT 1
-                """,
-                chat_id
-            )
-            
-            if not user:
-                return {
-                    "success": False,
-                    "error": "User not found or not approved",
-                    "chat_id": chat_id
-                }
-            
+    cached = _worker_type_cache.get(chat_id)
+    if cached is not None:
+        return cached
+    
+    pool = await get_db()
+    async with pool.acquire() as conn:
+        # Query contractor_applications table
+        user = await conn.fetchrow(SQL_GET_WORKER, chat_id)
+        
+        if not user:
             return {
-                "success": True,
-                "user": {
-                    "id": user["id"],
-                    "name": f"{user['first_name'] or ''} {user['last_name'] or ''}".strip(),
-                    "email": user["email"],
-                    "username": user["username"],
-                    "worker_type": user["worker_type"]
-                }
+                "success": False,
+                "error": "User not found or not approved",
+                "chat_id": chat_id
             }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        
+        response = {
+            "success": True,
+            "user": {
+                "id": user["id"],
+                "name": user["full_name"],
+                "email": user["email"],
+                "username": user["username"],
+                "worker_type": "day-rate" if user["username"] in DAY_RATE_USERS else "sub-contractor"
+            }
+        }
+        # Only cache approved users so newly approved applications show up immediately
+        _worker_type_cache[chat_id] = response
+        return response
 
 @app.get("/api/telegram/hours/{chat_id}")
 async def get_hours_summary(chat_id: str, period: str = "week"):
     """Get hours summary for day-rate workers"""
-    try:
-        pool = await get_db()
-        async with pool.acquire() as conn:
-            # First get the contractor info from chat_id
-            contractor = await conn.fetchrow(
-                """
-                SELECT first_name, last_name, admin_pay_rate, is_cis_registered
-                FROM contractor_applications 
-                WHERE telegram_id = $1 AND status = 'approved'
-                LIMIT 1
-                """,
-                chat_id
-            )
-            
-            if not contractor:
-                return {"success": False, "error": "User not found"}
-            
-            contractor_name = f"{contractor['first_name'] or ''} {contractor['last_name'] or ''}".strip()
-            
-            # Get hourly rate for calculations
-            hourly_rate = float(contractor.get("admin_pay_rate") or 9.0)
-            
-            # Get work sessions
-            if period == "today":
-                query = """
-                    SELECT id, contractor_name, start_time, end_time, total_hours, 
-                           job_site_location
-                    FROM work_sessions
-                    WHERE contractor_name = $1 
-                    AND DATE(start_time) = CURRENT_DATE
-                    ORDER BY start_time DESC
-                """
-            else:  # week
-                query = """
-                    SELECT id, contractor_name, start_time, end_time, total_hours,
-                           job_site_location
-                    FROM work_sessions
-                    WHERE contractor_name = $1 
-                    AND start_time >= CURRENT_DATE - INTERVAL '7 days'
-                    ORDER BY start_time DESC
-                """
-            
-            sessions = await conn.fetch(query, contractor_name)
-            
-            # Calculate totals with actual hourly rate
-            total_hours = 0
-            for s in sessions:
-                if s["total_hours"]:
-                    time_parts = s["total_hours"].split(":")
-                    hours = float(time_parts[0]) + float(time_parts[1])/60
-                    total_hours += hours
-            
-            total_gross = total_hours * hourly_rate
-            total_net = total_gross * 0.8  # Assume 20% CIS deduction
-            
-            return {
-                "success": True,
-                "period": period,
-                "contractor_name": contractor_name,
-                "summary": {
-                    "total_hours": round(total_hours, 2),
-                    "total_sessions": len(sessions),
-                    "total_gross_pay": round(total_gross, 2),
-                    "total_net_pay": round(total_net, 2)
-                },
-                "sessions": [
-                    {
-                        "id": s["id"],
-                        "date": s["start_time"].strftime("%Y-%m-%d"),
-                        "start_time": s["start_time"].strftime("%H:%M"),
-                        "end_time": s["end_time"].strftime("%H:%M") if s["end_time"] else "Active",
+    pool = await get_db()
+    async with pool.acquire() as conn:
+        # Contractor info and their work sessions in a single query
+        if period == "today":
+            query = SQL_HOURS_TODAY
+        else:  # week
+            query = SQL_HOURS_WEEK
+        
+        # Stream rows so sessions are built while later rows are still arriving;
+        # every row carries the contractor columns
+        contractor = None
+        sessions = []
+        async with conn.transaction():
+            async for s in conn.cursor(query, chat_id, prefetch=CURSOR_PREFETCH):
+                if contractor is None:
+                    contractor = s
+                if s["session_id"] is not None:
+                    sessions.append({
+                        "id": s["session_id"],
+                        "date": s["session_date"],
+                        "start_time": s["session_start"],
+                        "end_time": s["session_end"],
                         "hours": s["total_hours"] or "0:00",
                         "location": s["job_site_location"]
-                    }
-                    for s in sessions
-                ]
-            }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+                    })
+        
+        if contractor is None:
+            return {"success": False, "error": "User not found"}
+        
+        contractor_name = contractor["full_name"]
+        
+        # Get hourly rate for calculations
+        hourly_rate = float(contractor["admin_pay_rate"] or 9.0)
+        
+        # Calculate totals with actual hourly rate ("HH:MM" hours are summed in SQL)
+        total_hours = contractor["period_hours"].total_seconds() / 3600
+        
+        total_gross = total_hours * hourly_rate
+        total_net = total_gross * 0.8  # Assume 20% CIS deduction
+        
+        return {
+            "success": True,
+            "period": period,
+            "contractor_name": contractor_name,
+            "summary": {
+                "total_hours": round(total_hours, 2),
+                "total_sessions": len(sessions),
+                "total_gross_pay": round(total_gross, 2),
+                "total_net_pay": round(total_net, 2)
+            },
+            "sessions": sessions
+        }
 
 @app.get("/api/telegram/payments/{chat_id}")
 async def get_payment_status(chat_id: str):
     """Get payment status for day-rate workers"""
-    try:
-        pool = await get_db()
-        async with pool.acquire() as conn:
-            # Get contractor info
-            contractor = await conn.fetchrow(
-                """
-                SELECT first_name, last_name, admin_pay_rate, is_cis_registered
-                FROM contractor_applications 
-                WHERE telegram_id = $1 AND status = 'approved'
-                LIMIT 1
-                """,
-                chat_id
-            )
-            
-            if not contractor:
-                return {"success": False, "error": "User not found"}
-            
-            contractor_name = f"{contractor['first_name'] or ''} {contractor['last_name'] or ''}".strip()
-            
-            # Get this week's hours
-            week_sessions = await conn.fetch(
-                """
-                SELECT total_hours
-                FROM work_sessions
-                WHERE contractor_name = $1 
-                AND start_time >= CURRENT_DATE - INTERVAL '7 days'
-                """,
-                contractor_name
-            )
-            
-            # Calculate earnings based on hours and pay rate
-            total_week_hours = 0
-            for s in week_sessions:
-                if s["total_hours"]:
-                    time_parts = s["total_hours"].split(":")
-                    hours = float(time_parts[0]) + float(time_parts[1])/60
-                    total_week_hours += hours
-            
-            hourly_rate = float(contractor["admin_pay_rate"] or 9.0)
-            is_cis_registered = contractor["is_cis_registered"] == "true"
-            cis_rate = 20 if is_cis_registered else 30
-            
-            week_gross = total_week_hours * hourly_rate
-            week_net = week_gross * (1 - cis_rate/100)
-            
-            return {
-                "success": True,
-                "contractor_name": contractor_name,
-                "payment_info": {
-                    "hourly_rate": float(contractor["admin_pay_rate"] or 0),
-                    "cis_registered": contractor["is_cis_registered"] == "true",
-                    "cis_rate": 20 if contractor["is_cis_registered"] == "true" else 30,
-                    "this_week_gross": round(week_gross, 2),
-                    "this_week_net": round(week_net, 2),
-                    "cis_deduction": round(week_gross - week_net, 2)
-                }
+    pool = await get_db()
+    async with pool.acquire() as conn:
+        # Contractor info and this week's hours in a single round-trip
+        contractor = await conn.fetchrow(SQL_PAYMENT_STATUS, chat_id)
+        
+        if not contractor:
+            return {"success": False, "error": "User not found"}
+        
+        contractor_name = contractor["full_name"]
+        
+        # Calculate earnings based on hours and pay rate
+        total_week_hours = contractor["week_hours"].total_seconds() / 3600
+        
+        hourly_rate = float(contractor["admin_pay_rate"] or 9.0)
+        is_cis_registered = contractor["is_cis"]
+        cis_rate = 20 if is_cis_registered else 30
+        
+        week_gross = total_week_hours * hourly_rate
+        week_net = week_gross * (1 - cis_rate/100)
+        
+        return {
+            "success": True,
+            "contractor_name": contractor_name,
+            "payment_info": {
+                "hourly_rate": float(contractor["admin_pay_rate"] or 0),
+                "cis_registered": is_cis_registered,
+                "cis_rate": cis_rate,
+                "this_week_gross": round(week_gross, 2),
+                "this_week_net": round(week_net, 2),
+                "cis_deduction": round(week_gross - week_net, 2)
             }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        }
 
-@app.get("/api/telegram/subcontractor/quotes/{chat_id}")
-async def get_subcontractor_quotes(chat_id: str):
-    """Get quotes for sub-contractors"""
-    try:
-        pool = await get_db()
-        async with pool.acquire() as conn:
-            # Get contractor info
-            contractor = await conn.fetchrow(
-                """
-                SELECT id, first_name, last_name 
-                FROM contractor_applications 
-                WHERE telegram_id = $1 AND status = 'approved'
-                LIMIT 1
-                """,
-                chat_id
-            )
-            
-            if not contractor:
-                return {"success": False, "error": "User not found"}
-            
-            contractor_name = f"{contractor['first_name'] or ''} {contractor['last_name'] or ''}".strip()
-            
-            # Get jobs assigned to this contractor
-            jobs = await conn.fetch(
-                """
-                SELECT id, title, location, description, status
-                FROM jobs
-                WHERE contractor_name = $1
-                ORDER BY id DESC
-                """,
-                contractor_name
-            )
-            
-            return {
-                "success": True,
-                "contractor_name": contractor_name,
-                "data": [
-                    {
+async def get_subcontractor_jobs(chat_id: str) -> Optional[Dict[str, Any]]:
+    """Get contractor name and jobs for a sub-contractor, or None if not found"""
+    cached = _subcontractor_jobs_cache.get(chat_id)
+    if cached is not None:
+        return cached
+    
+    pool = await get_db()
+    contractor_name = None
+    jobs = []
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            async for j in conn.cursor(SQL_SUBCONTRACTOR_JOBS, chat_id, prefetch=CURSOR_PREFETCH):
+                contractor_name = j["full_name"]
+                if j["id"] is not None:
+                    jobs.append({
                         "id": j["id"],
                         "title": j["title"],
                         "location": j["location"],
                         "description": j["description"],
-                        "status": j["status"]
-                    }
-                    for j in jobs
-                ]
-            }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+                        "status": j["status"],
+                        "due_date": j["due_date"],
+                        "phases": j["phases"]
+                    })
+    
+    if contractor_name is None:
+        return None
+    
+    result = {"contractor_name": contractor_name, "jobs": jobs}
+    _subcontractor_jobs_cache[chat_id] = result
+    return result
+
+def quote_item(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Quote fields of a sub-contractor job"""
+    return {
+        "id": job["id"],
+        "title": job["title"],
+        "location": job["location"],
+        "description": job["description"],
+        "status": job["status"]
+    }
+
+def milestone_item(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Milestone fields of a sub-contractor job"""
+    return {
+        "job_id": job["id"],
+        "title": job["title"],
+        "location": job["location"],
+        "status": job["status"],
+        "due_date": job["due_date"],
+        "phases": job["phases"]
+    }
+
+def payment_status_item(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Payment status fields of a sub-contractor job"""
+    return {
+        "id": job["id"],
+        "title": job["title"],
+        "status": job["status"],
+        "due_date": job["due_date"]
+    }
+
+@app.get("/api/telegram/subcontractor/summary/{chat_id}")
+async def get_subcontractor_summary(chat_id: str):
+    """Get quotes, milestones and payment status for sub-contractors in one call"""
+    contractor = await get_subcontractor_jobs(chat_id)
+    
+    if not contractor:
+        return {"success": False, "error": "User not found"}
+    
+    jobs = contractor["jobs"]
+    return {
+        "success": True,
+        "contractor_name": contractor["contractor_name"],
+        "quotes": [quote_item(j) for j in jobs],
+        "milestones": [milestone_item(j) for j in jobs],
+        "payment_status": [payment_status_item(j) for j in jobs]
+    }
+
+@app.get("/api/telegram/subcontractor/quotes/{chat_id}")
+async def get_subcontractor_quotes(chat_id: str):
+    """Get quotes for sub-contractors"""
+    contractor = await get_subcontractor_jobs(chat_id)
+    
+    if not contractor:
+        return {"success": False, "error": "User not found"}
+    
+    return {
+        "success": True,
+        "contractor_name": contractor["contractor_name"],
+        "data": [quote_item(j) for j in contractor["jobs"]]
+    }
 
 @app.get("/api/telegram/subcontractor/milestones/{chat_id}")
 async def get_subcontractor_milestones(chat_id: str):
     """Get milestones for sub-contractors"""
-    try:
-        pool = await get_db()
-        async with pool.acquire() as conn:
-            # Get contractor info
-            contractor = await conn.fetchrow(
-                """
-                SELECT id, first_name, last_name 
-                FROM contractor_applications 
-                WHERE telegram_id = $1 AND status = 'approved'
-                LIMIT 1
-                """,
-                chat_id
-            )
-            
-            if not contractor:
-                return {"success": False, "error": "User not found"}
-            
-            contractor_name = f"{contractor['first_name'] or ''} {contractor['last_name'] or ''}".strip()
-            
-            # Get jobs and their progress
-            jobs = await conn.fetch(
-                """
-                SELECT id, title, location, status, due_date, phases
-                FROM jobs
-                WHERE contractor_name = $1
-                ORDER BY id DESC
-                """,
-                contractor_name
-            )
-            
-            return {
-                "success": True,
-                "contractor_name": contractor_name,
-                "data": [
-                    {
-                        "job_id": j["id"],
-                        "title": j["title"],
-                        "location": j["location"],
-                        "status": j["status"],
-                        "due_date": j["due_date"],
-                        "phases": j["phases"]
-                    }
-                    for j in jobs
-                ]
-            }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    contractor = await get_subcontractor_jobs(chat_id)
+    
+    if not contractor:
+        return {"success": False, "error": "User not found"}
+    
+    return {
+        "success": True,
+        "contractor_name": contractor["contractor_name"],
+        "data": [milestone_item(j) for j in contractor["jobs"]]
+    }
 
 @app.get("/api/telegram/subcontractor/payment-status/{chat_id}")
 async def get_subcontractor_payment_status(chat_id: str):
     """Get payment status for sub-contractors"""
-    try:
-        pool = await get_db()
-        async with pool.acquire() as conn:
-            # Get contractor info
-            contractor = await conn.fetchrow(
-                """
-                SELECT id, first_name, last_name 
-                FROM contractor_applications 
-                WHERE telegram_id = $1 AND status = 'approved'
-                LIMIT 1
-                """,
-                chat_id
-            )
-            
-            if not contractor:
-                return {"success": False, "error": "User not found"}
-            
-            contractor_name = f"{contractor['first_name'] or ''} {contractor['last_name'] or ''}".strip()
-            
-            # Get jobs assigned to this contractor
-            jobs = await conn.fetch(
-                """
-                SELECT id, title, status, due_date
-                FROM jobs
-                WHERE contractor_name = $1
-                """,
-                contractor_name
-            )
-            
-            # Count jobs by status
-            completed_jobs = [j for j in jobs if j["status"] == "completed"]
-            in_progress_jobs = [j for j in jobs if j["status"] in ("assigned", "pending")]
-            
-            return {
-                "success": True,
-                "contractor_name": contractor_name,
-                "data": [
-                    {
-                        "id": j["id"],
-                        "title": j["title"],
-                        "status": j["status"],
-                        "due_date": j["due_date"]
-                    }
-                    for j in jobs
-                ]
-            }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    contractor = await get_subcontractor_jobs(chat_id)
+    
+    if not contractor:
+        return {"success": False, "error": "User not found"}
+    
+    return {
+        "success": True,
+        "contractor_name": contractor["contractor_name"],
+        "data": [payment_status_item(j) for j in contractor["jobs"]]
+    }
 
 @app.get("/api/telegram/conversation-history/{telegram_id}")
 async def get_conversation_history(telegram_id: int, limit: int = Query(default=10, ge=1, le=100)):
     """Get conversation history for a Telegram user"""
-    try:
-        pool = await get_db()
-        async with pool.acquire() as conn:
-            # Get last N messages in chronological order (oldest first)
-            messages = await conn.fetch(
-                """
-                SELECT role, message, created_at
-                FROM conversation_history
-                WHERE telegram_id = $1
-                ORDER BY id DESC
-                LIMIT $2
-                """,
-                telegram_id,
-                limit
-            )
-            
-            # Reverse to get chronological order (oldest first)
-            messages = list(reversed(messages))
-            
-            return {
-                "success": True,
-                "messages": [
-                    {
-                        "role": m["role"],
-                        "content": m["message"]
-                    }
-                    for m in messages
-                ]
-            }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    pool = await get_db()
+    async with pool.acquire() as conn:
+        # Get last N messages in chronological order (oldest first)
+        messages = await conn.fetch(SQL_CONVERSATION_HISTORY, telegram_id, limit)
+        
+        return {
+            "success": True,
+            "messages": [
+                {
+                    "role": m["role"],
+                    "content": m["message"]
+                }
+                for m in messages
+            ]
+        }
 
 @app.post("/api/telegram/conversation-history")
 async def save_conversation_message(data: ConversationMessage):
     """Save a conversation message"""
-    try:
-        pool = await get_db()
-        async with pool.acquire() as conn:
-            await conn.execute(
-                """
-                INSERT INTO conversation_history (telegram_id, role, message)
-                VALUES ($1, $2, $3)
-                """,
-                data.telegram_id,
-                data.role,
-                data.message
-            )
-            
-            return {"success": True}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    await get_db()
+    
+    # Written to the database in batches by conversation_writer
+    conversation_queue.put_nowait((data.telegram_id, data.role, data.message))
+    
+    return {"success": True}
 
 # ============ LEGACY TWILIO TEST ENDPOINT ============
 
+# Built once and reused - the body is below GZipMiddleware's minimum_size, so
+# no middleware modifies it
+_TWIML_RESPONSE = Response(
+    content=b"""<Response>
+  <Say>Twilio test path is working.</Say>
+  <Hangup/>
+</Response>""",
+    media_type="application/xml"
+)
+
 @app.post("/twiml/test")
 async def twiml_test():
     """Test endpoint for Twilio TwiML"""
-    xml = """
-<Response>
-  <Say>Twilio test path is working.</Say>
-  <Hangup/>
-</Response>"""
-    return Response(xml.strip(), media_type="application/xml")
+    return _TWIML_RESPONSE
 
 # ============ HEALTH CHECK ============
 
@@ -496,19 +622,11 @@ async def root():
 @app.get("/health")
 async def health():
     """Detailed health check"""
-    db_status = "connected"
-    if db_pool:
-        try:
-            async with db_pool.acquire() as conn:
-                await conn.fetchval("SELECT 1")
-        except Exception as e:
-            db_status = f"error: {str(e)}"
-    else:
-        db_status = "not configured"
-    
+    # Reported from the last background check rather than pinging per request
     return {
         "status": "healthy",
-        "database": db_status,
+        "database": db_health["status"],
+        "database_checked_at": db_health["checked_at"],
         "endpoints": [
             "/api/telegram/worker-type/{chat_id}",
             "/api/telegram/hours/{chat_id}",
@@ -516,6 +634,7 @@ async def health():
             "/api/telegram/subcontractor/quotes/{chat_id}",
             "/api/telegram/subcontractor/milestones/{chat_id}",
             "/api/telegram/subcontractor/payment-status/{chat_id}",
+            "/api/telegram/subcontractor/summary/{chat_id}",
             "/api/telegram/conversation-history/{telegram_id}",
             "POST /api/telegram/conversation-history"
         ]
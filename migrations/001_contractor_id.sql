@@ -0,0 +1,116 @@
+-- Link work_sessions and jobs to contractor_applications by id instead of
+-- matching on the concatenated "first_name last_name" string.
+--
+-- Safe to run more than once. Apply with:
+--   psql "postgresql://$PGUSER:$PGPASSWORD@$PGHOST:$PGPORT/$PGDATABASE" -f migrations/001_contractor_id.sql
+
+BEGIN;
+
+-- contractor_id uses the same type as contractor_applications.id
+DO $$
+DECLARE
+    id_type text;
+BEGIN
+    SELECT format_type(atttypid, atttypmod) INTO id_type
+    FROM pg_attribute
+    WHERE attrelid = 'contractor_applications'::regclass AND attname = 'id';
+
+    EXECUTE format(
+        'ALTER TABLE work_sessions ADD COLUMN IF NOT EXISTS contractor_id %s
+             REFERENCES contractor_applications(id) ON DELETE SET NULL',
+        id_type
+    );
+    EXECUTE format(
+        'ALTER TABLE jobs ADD COLUMN IF NOT EXISTS contractor_id %s
+             REFERENCES contractor_applications(id) ON DELETE SET NULL',
+        id_type
+    );
+END $$;
+
+-- Resolve a contractor name to its application, preferring approved ones
+CREATE OR REPLACE FUNCTION contractor_id_for_name(name text)
+RETURNS contractor_applications.id%TYPE
+LANGUAGE sql STABLE AS $$
+    SELECT id
+    FROM contractor_applications
+    WHERE trim(concat_ws(' ', first_name, last_name)) = name
+    ORDER BY (status = 'approved') DESC, id DESC
+    LIMIT 1
+$$;
+
+-- Backfill existing rows
+UPDATE work_sessions
+SET contractor_id = contractor_id_for_name(contractor_name)
+WHERE contractor_id IS NULL AND contractor_name IS NOT NULL;
+
+UPDATE jobs
+SET contractor_id = contractor_id_for_name(contractor_name)
+WHERE contractor_id IS NULL AND contractor_name IS NOT NULL;
+
+-- Rows are still written by name from the Node.js app, so keep contractor_id in sync
+CREATE OR REPLACE FUNCTION set_contractor_id_from_name()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF NEW.contractor_name IS NOT NULL AND (
+        NEW.contractor_id IS NULL
+        OR (TG_OP = 'UPDATE' AND NEW.contractor_name IS DISTINCT FROM OLD.contractor_name)
+    ) THEN
+        NEW.contractor_id := contractor_id_for_name(NEW.contractor_name);
+    END IF;
+    RETURN NEW;
+END
+$$;
+
+DROP TRIGGER IF EXISTS work_sessions_set_contractor_id ON work_sessions;
+CREATE TRIGGER work_sessions_set_contractor_id
+    BEFORE INSERT OR UPDATE OF contractor_name, contractor_id ON work_sessions
+    FOR EACH ROW EXECUTE FUNCTION set_contractor_id_from_name();
+
+DROP TRIGGER IF EXISTS jobs_set_contractor_id ON jobs;
+CREATE TRIGGER jobs_set_contractor_id
+    BEFORE INSERT OR UPDATE OF contractor_name, contractor_id ON jobs
+    FOR EACH ROW EXECUTE FUNCTION set_contractor_id_from_name();
+
+-- Sessions and jobs can be written before the matching application exists or
+-- is approved, and a re-application changes which application a name resolves
+-- to. Re-link rows for the affected names whenever applications change.
+CREATE OR REPLACE FUNCTION relink_contractor_rows()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    names text[] := ARRAY[]::text[];
+    n text;
+    resolved contractor_applications.id%TYPE;
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        names := names || trim(concat_ws(' ', NEW.first_name, NEW.last_name));
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        names := names || trim(concat_ws(' ', OLD.first_name, OLD.last_name));
+    END IF;
+
+    FOREACH n IN ARRAY names LOOP
+        resolved := contractor_id_for_name(n);
+        UPDATE work_sessions SET contractor_id = resolved
+        WHERE contractor_name = n AND contractor_id IS DISTINCT FROM resolved;
+        UPDATE jobs SET contractor_id = resolved
+        WHERE contractor_name = n AND contractor_id IS DISTINCT FROM resolved;
+    END LOOP;
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS contractor_applications_relink_contractor_rows ON contractor_applications;
+CREATE TRIGGER contractor_applications_relink_contractor_rows
+    AFTER INSERT OR DELETE OR UPDATE OF first_name, last_name, status ON contractor_applications
+    FOR EACH ROW EXECUTE FUNCTION relink_contractor_rows();
+
+-- Range scans for "latest sessions / jobs for a contractor"
+CREATE INDEX IF NOT EXISTS work_sessions_contractor_id_start_time_idx
+    ON work_sessions (contractor_id, start_time DESC);
+
+CREATE INDEX IF NOT EXISTS jobs_contractor_id_id_idx
+    ON jobs (contractor_id, id DESC);
+
+COMMIT;
@@ -0,0 +1,9 @@
+-- Boolean view of contractor_applications.is_cis_registered, which is stored
+-- as the text 'true' / 'false'.
+--
+-- Safe to run more than once. Apply with:
+--   psql "postgresql://$PGUSER:$PGPASSWORD@$PGHOST:$PGPORT/$PGDATABASE" -f migrations/002_is_cis.sql
+
+ALTER TABLE contractor_applications
+    ADD COLUMN IF NOT EXISTS is_cis boolean
+    GENERATED ALWAYS AS (COALESCE(is_cis_registered = 'true', false)) STORED;